@@ -1,4 +1,14 @@
 import os
+from typing import Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def _optional_env(name: str, cast: Callable[[str], T]) -> Optional[T]:
+    """Читает необязательную переменную окружения (пустое значение - None)."""
+    value = os.getenv(name, "").strip()
+    return cast(value) if value else None
+
 
 class Settings:
     # API Config
@@ -19,8 +29,29 @@ class Settings:
     def MODEL_PATH(self) -> str:
         return os.path.join(self.MODEL_ARTIFACTS_DIR, self.MODEL_FILE_NAME)
 
+    # Сырые размеченные выгрузки (baseline для мониторинга дрейфа, офлайн-оценка)
+    DATA_DIR: str = os.path.join(os.path.dirname(BASE_DIR), "data")
+    TRANSACTIONS_CSV: str = "транзакции в Мобильном интернет Банкинге.csv"
+    PATTERNS_CSV: str = "поведенческие паттерны клиентов.csv"
+    TRAIN_SPLIT_RATIO: float = 0.80  # Доля обучающей выборки при time-series split
+    DRIFT_MIN_ROWS: int = 300  # Минимум наблюдений признака для статуса дрейфа в /drift
+
+    # Файл декларативных правил (проверяются до ML-модели, перечитываются на лету)
+    RULES_PATH: str = os.path.join(BASE_DIR, "rules", "fraud_rules.json")
+
+    # Загрузка модели в фоновом потоке: API сразу отвечает на / и /health,
+    # а готовность к скорингу сообщает /ready (отключается BACKGROUND_MODEL_LOADING=0)
+    BACKGROUND_MODEL_LOADING: bool = os.getenv("BACKGROUND_MODEL_LOADING", "1") == "1"
+
     # ML Logic Defaults
     DEFAULT_BLOCK_THRESHOLD: float = 0.60
     DEFAULT_SHAP_THRESHOLD: float = 0.5  # Порог для расчёта SHAP-объяснений
 
+    # Бюджет SHAP-объяснений (None/не задано - без ограничения).
+    # POST /explanations/budget меняет политику только до перезапуска процесса
+    SHAP_MAX_PER_REQUEST: Optional[int] = _optional_env("SHAP_MAX_PER_REQUEST", int)  # Объяснять только top-K самых рискованных строк пакета
+    SHAP_RATE_PER_SECOND: Optional[float] = _optional_env("SHAP_RATE_PER_SECOND", float)  # Token bucket: объяснений в секунду
+    SHAP_BURST: Optional[int] = _optional_env("SHAP_BURST", int)  # Ёмкость token bucket
+    SHAP_OVERFLOW: str = os.getenv("SHAP_OVERFLOW", "skip")  # "skip" или "defer" (досчитать в фоне, см. /explanations/{id})
+
 settings = Settings()
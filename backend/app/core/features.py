@@ -0,0 +1,13 @@
+# Список признаков модели (порядок важен!)
+NUMERIC_FEATURES = [
+    'amount', 'log_amount', 'hour_of_day', 'day_of_week', 'is_night', 'is_weekend',
+    'is_month_end', 'is_month_start', 'monthly_os_changes', 'monthly_phone_model_changes',
+    'logins_last_7_days', 'logins_last_30_days', 'login_frequency_7d', 'login_frequency_30d',
+    'freq_change_7d_vs_mean', 'logins_7d_over_30d_ratio', 'avg_login_interval_30d',
+    'std_login_interval_30d', 'ewm_login_interval_7d', 'burstiness_login_interval',
+    'zscore_avg_login_interval_7d', 'is_cold_start'
+]
+
+CATEGORICAL_FEATURES = ['os_family', 'phone_brand', 'direction']
+
+MODEL_FEATURES = NUMERIC_FEATURES + CATEGORICAL_FEATURES
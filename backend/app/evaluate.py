@@ -0,0 +1,64 @@
+"""
+Офлайн-оценка модели на размеченных данных.
+
+Запуск (из каталога backend/app):
+    python evaluate.py                      # holdout-часть выгрузок из data/
+    python evaluate.py --all                # все размеченные данные из data/
+    python evaluate.py --file labeled.csv   # CSV с признаками модели и is_fraud/target
+
+Считает ROC-AUC, PR-AUC, F1, матрицу ошибок и кривые сэкономленных денег
+по всем порогам за один проход по отсортированным скорам.
+"""
+import argparse
+import json
+
+from core.config import settings
+from services import MLPredictorService
+from services.dataset_loader import load_labeled_dataset, split_train_test
+from services.evaluation import evaluate_dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline evaluation of the fraud model on labeled data")
+    parser.add_argument("--file", help="Labeled CSV with model features and is_fraud/target column")
+    parser.add_argument("--all", action="store_true", help="Evaluate on all rows of data/, not only holdout")
+    parser.add_argument("--threshold", type=float, default=settings.DEFAULT_BLOCK_THRESHOLD,
+                        help="Block threshold for the confusion matrix")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per scoring chunk")
+    parser.add_argument("--output", help="Write full JSON report (with curves) to this path")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    if args.file:
+        df = pd.read_csv(args.file)
+        source = args.file
+    else:
+        df = load_labeled_dataset(settings.DATA_DIR, settings.TRANSACTIONS_CSV, settings.PATTERNS_CSV)
+        if not args.all:
+            _, df = split_train_test(df, settings.TRAIN_SPLIT_RATIO)
+        source = "data/ (all)" if args.all else "data/ holdout"
+
+    ml_service = MLPredictorService(model_path=settings.MODEL_PATH, initial_threshold=args.threshold)
+    curves = evaluate_dataset(ml_service, df, chunk_size=args.chunk_size)
+    report = {"source": source, **curves.summary(args.threshold)}
+
+    at = report["at_threshold"]
+    print(f"Source:    {source} ({report['rows']} rows, {report['positives']} fraud)")
+    print(f"ROC-AUC:   {report['roc_auc']}")
+    print(f"PR-AUC:    {report['pr_auc']}")
+    if report["best_f1"]:
+        print(f"Best F1:   {report['best_f1']['f1_score']} at threshold {report['best_f1']['threshold']:.4f}")
+    print(f"\nAt threshold {args.threshold}:")
+    print(f"  precision {at['precision']}, recall {at['recall']}, f1 {at['f1_score']}, accuracy {at['accuracy']}")
+    print(f"  TP {at['true_positives']}  FP {at['false_positives']}  TN {at['true_negatives']}  FN {at['false_negatives']}")
+    print(f"  money saved {at['fraud_amount_blocked']:,.0f}, legit amount blocked {at['legit_amount_blocked']:,.0f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 from .schemas import (
     TransactionInput,
     ConfigUpdate,
+    ExplanationBudgetUpdate,
     ShapExplanationItem,
+    RuleHit,
     BatchPredictionResult
 )
 
 __all__ = [
     "TransactionInput",
     "ConfigUpdate",
+    "ExplanationBudgetUpdate",
     "ShapExplanationItem",
+    "RuleHit",
     "BatchPredictionResult"
 ]
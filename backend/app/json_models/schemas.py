@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class ShapExplanationItem(BaseModel):
     feature_name: str
@@ -40,9 +40,21 @@ class TransactionInput(BaseModel):
 class ConfigUpdate(BaseModel):
     threshold: float = Field(..., ge=0.0, le=1.0, description="Threshold for fraud detection (0.0 to 1.0)")
 
+class ExplanationBudgetUpdate(BaseModel):
+    max_per_request: Optional[int] = Field(None, ge=0, description="Max SHAP explanations per batch (riskiest rows first)")
+    rate_per_second: Optional[float] = Field(None, gt=0.0, description="Token bucket refill rate, explanations per second")
+    burst: Optional[int] = Field(None, ge=1, description="Token bucket capacity")
+    overflow: Literal["skip", "defer"] = Field("skip", description="What to do with rows over budget")
+
+class RuleHit(BaseModel):
+    name: str
+    action: Literal["BLOCK", "PASS", "NO_EXPLAIN"]
+
 class BatchPredictionResult(BaseModel):
     transaction_id: int
     amount: float
     score: float
     verdict: str
     explanation: Optional[List[ShapExplanationItem]] = None
+    explanation_status: Optional[str] = None
+    rule: Optional[RuleHit] = None
@@ -1,17 +1,31 @@
-import pandas as pd
 import asyncio
 import io
-from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File
+import numpy as np
+import threading
+import time
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, BackgroundTasks, UploadFile, File, Query
 from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from core.config import settings
-from services import MLPredictorService, StatsService
+from core.features import MODEL_FEATURES
+from services import MLPredictorService, StatsService, RuleEngine, ExplanationBudget, DriftService
+from services.dataset_loader import load_labeled_dataset, split_train_test
+from services.evaluation import (
+    ThresholdCurves,
+    classification_metrics,
+    confusion_matrix,
+    evaluate_dataset,
+    find_label_column
+)
 from json_models import (
     TransactionInput, 
     BatchPredictionResult, 
-    ConfigUpdate
+    ConfigUpdate,
+    ExplanationBudgetUpdate
 )
 
 app = FastAPI(
@@ -31,6 +45,14 @@ app.add_middleware(
 # Глобальные экземпляры сервисов
 ml_service: Optional[MLPredictorService] = None
 stats_service = StatsService()
+drift_service = DriftService(min_rows=settings.DRIFT_MIN_ROWS)
+rule_engine = RuleEngine(settings.RULES_PATH)
+explanation_budget = ExplanationBudget(
+    max_per_request=settings.SHAP_MAX_PER_REQUEST,
+    rate_per_second=settings.SHAP_RATE_PER_SECOND,
+    burst=settings.SHAP_BURST,
+    overflow=settings.SHAP_OVERFLOW
+)
 
 # Состояние переобучения модели
 retrain_status = {
@@ -41,31 +63,118 @@ retrain_status = {
     "error": None
 }
 
-@app.on_event("startup")
-def startup_event():
+# Результат офлайн-оценки модели на holdout-части data/
+evaluation_state = {
+    "status": "not_run",
+    "error": None,
+    "rows": None,
+    "evaluated_at": None,
+    "curves": None
+}
+
+# Состояние загрузки модели
+model_status = {
+    "state": "not_loaded",
+    "error": None,
+    "load_time_seconds": None
+}
+
+def load_model():
+    """
+    Загружает модель и SHAP explainer.
+    Тяжёлые импорты (pandas, shap, catboost) происходят здесь, а не при импорте модуля.
+    """
     global ml_service
+    model_status["state"] = "loading"
+    model_status["error"] = None
+    started = time.perf_counter()
     try:
         print(f"Loading model from {settings.MODEL_PATH}...")
         ml_service = MLPredictorService(
             model_path=settings.MODEL_PATH,
             initial_threshold=settings.DEFAULT_BLOCK_THRESHOLD,
-            shap_threshold=settings.DEFAULT_SHAP_THRESHOLD
+            shap_threshold=settings.DEFAULT_SHAP_THRESHOLD,
+            rule_engine=rule_engine,
+            explanation_budget=explanation_budget
         )
-        print("Model loaded successfully.")
+        model_status["state"] = "ready"
+        model_status["load_time_seconds"] = round(time.perf_counter() - started, 3)
+        print(f"Model loaded successfully in {model_status['load_time_seconds']}s.")
     except Exception as e:
+        model_status["state"] = "error"
+        model_status["error"] = str(e)
         print(f"Error loading model: {e}")
         # В продакшене здесь стоит остановить запуск, если модель критична
         # raise e
 
+    load_reference_data()
+
+def load_reference_data():
+    """
+    Загружает размеченные данные из data/: обучающая часть - baseline для
+    мониторинга дрейфа, отложенная (holdout) - офлайн-оценка модели.
+    """
+    try:
+        dataset = load_labeled_dataset(settings.DATA_DIR, settings.TRANSACTIONS_CSV, settings.PATTERNS_CSV)
+    except Exception as e:
+        print(f"Error loading reference data: {e}")
+        return
+
+    train_df, holdout_df = split_train_test(dataset, settings.TRAIN_SPLIT_RATIO)
+    try:
+        drift_service.load_baseline(train_df)
+        print(f"Drift baseline built from {len(train_df)} rows.")
+    except Exception as e:
+        print(f"Error loading drift baseline: {e}")
+
+    if ml_service:
+        run_holdout_evaluation(holdout_df)
+
+def run_holdout_evaluation(holdout_df):
+    """Оценивает модель на holdout-части data/ и сохраняет измеренные метрики."""
+    evaluation_state["status"] = "running"
+    try:
+        evaluation_state["curves"] = evaluate_dataset(ml_service, holdout_df)
+        evaluation_state["rows"] = len(holdout_df)
+        evaluation_state["evaluated_at"] = datetime.now().isoformat()
+        evaluation_state["status"] = "completed"
+        evaluation_state["error"] = None
+        print(f"Holdout evaluation: ROC-AUC {evaluation_state['curves'].roc_auc()} on {len(holdout_df)} rows.")
+    except Exception as e:
+        evaluation_state["status"] = "error"
+        evaluation_state["error"] = str(e)
+        print(f"Error evaluating model: {e}")
+
+@app.on_event("startup")
+def startup_event():
+    if settings.BACKGROUND_MODEL_LOADING:
+        # Сервер начинает принимать запросы сразу, модель догружается в фоне
+        threading.Thread(target=load_model, name="model-loader", daemon=True).start()
+    else:
+        load_model()
+
 @app.get("/")
 def read_root():
     return {"message": f"Welcome to {settings.PROJECT_TITLE}"}
 
+@app.get("/health")
+def health_check():
+    """Liveness-проверка: процесс запущен и отвечает."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness_check():
+    """Readiness-проверка: 200, когда модель загружена и сервис готов к скорингу."""
+    status_code = 200 if model_status["state"] == "ready" else 503
+    return JSONResponse(status_code=status_code, content=model_status)
+
 @app.post(f"{settings.API_V1_STR}/predict", response_model=List[BatchPredictionResult])
 def predict_transactions(transactions: List[TransactionInput]):
     if not ml_service:
         raise HTTPException(status_code=503, detail="ML Service not initialized")
     
+    import pandas as pd
+
     # Преобразование Pydantic моделей в DataFrame
     try:
         data = [t.model_dump() for t in transactions]
@@ -80,7 +189,7 @@ def predict_transactions(transactions: List[TransactionInput]):
     
     # Скоринг
     try:
-        results = ml_service.score_batch(features_df)
+        results = ml_service.score_batch(features_df, transaction_ids=df['transaction_id'].tolist())
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
     
@@ -96,6 +205,7 @@ def predict_transactions(transactions: List[TransactionInput]):
     
     # Обновление статистики (передаём полные данные с amount и transaction_id)
     stats_service.update_stats_from_batch(final_results)
+    drift_service.update_from_batch(features_df)
         
     return final_results
 
@@ -114,6 +224,7 @@ def get_dashboard_stats():
 @app.post(f"{settings.API_V1_STR}/stats/reset")
 def reset_stats():
     stats_service.reset_stats()
+    explanation_budget.reset_stats()
     return {"status": "stats reset"}
 
 @app.post(f"{settings.API_V1_STR}/config")
@@ -135,19 +246,153 @@ def get_config():
     if not ml_service:
         raise HTTPException(status_code=503, detail="ML Service not initialized")
     
+    # Метрики измерены на holdout-части data/ (None, пока оценка не выполнена)
+    curves = evaluation_state["curves"]
+    roc_auc = f1_score = None
+    if curves is not None:
+        roc_auc = round(curves.roc_auc(), 3) if curves.roc_auc() is not None else None
+        f1_score = round(classification_metrics(curves.confusion_at(ml_service.threshold))["f1_score"], 3)
+    
     return {
         "threshold": ml_service.threshold,
         "shap_threshold": ml_service.shap_threshold,
         "model_info": {
             "algorithm": "CatBoost Classifier",
             "version": "v2.4.1",
-            "features_count": 25,
+            "features_count": len(MODEL_FEATURES),
             "trained_date": "2025-11-27",
-            "roc_auc": 0.967,
-            "f1_score": 0.943
+            "roc_auc": roc_auc,
+            "f1_score": f1_score,
+            "evaluated_rows": evaluation_state["rows"],
+            "evaluated_at": evaluation_state["evaluated_at"]
         }
     }
 
+# --- Drift monitoring endpoints ---
+
+@app.get(f"{settings.API_V1_STR}/drift")
+def get_drift_report(details: bool = False):
+    """
+    Отчёт о дрейфе входных признаков относительно обучающих данных (PSI, KS).
+    С details=true включает гистограммы и частоты категорий.
+    """
+    return drift_service.get_report(details=details)
+
+@app.post(f"{settings.API_V1_STR}/drift/reset")
+def reset_drift():
+    drift_service.reset_stats()
+    return {"status": "drift stats reset"}
+
+# --- Rules endpoints ---
+
+@app.get(f"{settings.API_V1_STR}/rules")
+def get_rules():
+    """Возвращает загруженные правила и счётчики их срабатываний."""
+    return rule_engine.get_rules()
+
+@app.post(f"{settings.API_V1_STR}/rules/reload")
+def reload_rules():
+    """Принудительно перечитывает файл правил (обычно это происходит автоматически)."""
+    reloaded = rule_engine.reload(force=True)
+    state = rule_engine.get_rules()
+    if state["last_error"]:
+        raise HTTPException(status_code=400, detail=state["last_error"])
+    return {"status": "reloaded" if reloaded else "unchanged", "rules_count": len(state["rules"])}
+
+# --- Explanations endpoints ---
+
+@app.get(f"{settings.API_V1_STR}/explanations/budget")
+def get_explanation_budget():
+    """Возвращает политику бюджета SHAP и счётчики объяснённых/отложенных/пропущенных."""
+    stats = explanation_budget.get_stats()
+    stats["pending"] = ml_service.deferred_explanations.pending_count() if ml_service else 0
+    return stats
+
+@app.post(f"{settings.API_V1_STR}/explanations/budget")
+def update_explanation_budget(budget: ExplanationBudgetUpdate):
+    """Обновляет политику бюджета SHAP-объяснений (частично: только переданные поля)."""
+    # Применяются только переданные клиентом поля
+    try:
+        data = budget.model_dump(exclude_unset=True)
+    except AttributeError:
+        data = budget.dict(exclude_unset=True)
+    return explanation_budget.update(**data)
+
+@app.get(f"{settings.API_V1_STR}/explanations/{{transaction_id}}")
+def get_deferred_explanation(transaction_id: str):
+    """
+    Возвращает отложенное SHAP-объяснение транзакции.
+    Статус: pending (в очереди), ready (готово) или error.
+    """
+    if not ml_service:
+        raise HTTPException(status_code=503, detail="ML Service not initialized")
+
+    result = ml_service.deferred_explanations.get(transaction_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="No deferred explanation for this transaction")
+    return {"transaction_id": transaction_id, **result}
+
+# --- Offline evaluation endpoints ---
+
+@app.post(f"{settings.API_V1_STR}/evaluate")
+async def evaluate_model(file: Optional[UploadFile] = File(None),
+                         threshold: Optional[float] = Query(None, ge=0.0, le=1.0)):
+    """
+    Офлайн-оценка модели: ROC-AUC, PR-AUC, F1, матрица ошибок и кривые
+    сэкономленных денег по всем порогам.
+    
+    Без файла - переоценка на holdout-части data/ (обновляет метрики в /config).
+    С CSV-файлом (признаки модели + is_fraud/target) - оценка загруженного датасета.
+    """
+    if not ml_service:
+        raise HTTPException(status_code=503, detail="ML Service not initialized")
+    
+    threshold = ml_service.threshold if threshold is None else threshold
+    
+    import pandas as pd
+    
+    if file is None:
+        try:
+            dataset = await asyncio.to_thread(
+                load_labeled_dataset, settings.DATA_DIR, settings.TRANSACTIONS_CSV, settings.PATTERNS_CSV
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error loading data: {str(e)}")
+        _, holdout_df = split_train_test(dataset, settings.TRAIN_SPLIT_RATIO)
+        await asyncio.to_thread(run_holdout_evaluation, holdout_df)
+        if evaluation_state["status"] != "completed":
+            raise HTTPException(status_code=500, detail=f"Evaluation error: {evaluation_state['error']}")
+        return {"source": "data/ holdout", **evaluation_state["curves"].summary(threshold)}
+    
+    try:
+        contents = await file.read()
+        df = pd.read_csv(io.BytesIO(contents))
+    except pd.errors.EmptyDataError:
+        raise HTTPException(status_code=400, detail="CSV file is empty")
+    
+    try:
+        curves = await asyncio.to_thread(evaluate_dataset, ml_service, df)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Evaluation error: {str(e)}")
+    
+    return {"source": file.filename, **curves.summary(threshold)}
+
+@app.get(f"{settings.API_V1_STR}/evaluate")
+def get_evaluation(threshold: Optional[float] = Query(None, ge=0.0, le=1.0)):
+    """Возвращает последнюю оценку на holdout-части data/."""
+    if evaluation_state["curves"] is None:
+        return {key: value for key, value in evaluation_state.items() if key != "curves"}
+    
+    if threshold is None:
+        threshold = ml_service.threshold if ml_service else settings.DEFAULT_BLOCK_THRESHOLD
+    return {
+        "source": "data/ holdout",
+        "evaluated_at": evaluation_state["evaluated_at"],
+        **evaluation_state["curves"].summary(threshold)
+    }
+
 # --- Retrain endpoints ---
 
 async def simulate_retraining():
@@ -216,16 +461,6 @@ def get_retrain_status():
 
 # --- CSV Upload endpoint ---
 
-# Список признаков модели (порядок важен!)
-MODEL_FEATURES = [
-    'amount', 'log_amount', 'hour_of_day', 'day_of_week', 'is_night', 'is_weekend',
-    'is_month_end', 'is_month_start', 'monthly_os_changes', 'monthly_phone_model_changes',
-    'logins_last_7_days', 'logins_last_30_days', 'login_frequency_7d', 'login_frequency_30d',
-    'freq_change_7d_vs_mean', 'logins_7d_over_30d_ratio', 'avg_login_interval_30d',
-    'std_login_interval_30d', 'ewm_login_interval_7d', 'burstiness_login_interval',
-    'zscore_avg_login_interval_7d', 'is_cold_start', 'os_family', 'phone_brand', 'direction'
-]
-
 @app.post(f"{settings.API_V1_STR}/predict/csv")
 async def predict_from_csv(file: UploadFile = File(...)):
     """
@@ -242,6 +477,8 @@ async def predict_from_csv(file: UploadFile = File(...)):
     
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are supported")
+
+    import pandas as pd
     
     try:
         # Читаем CSV
@@ -258,92 +495,74 @@ async def predict_from_csv(file: UploadFile = File(...)):
         
         # Сохраняем дополнительные колонки если есть
         has_transaction_id = 'transaction_id' in df.columns
-        has_is_fraud = 'is_fraud' in df.columns
+        label_col = find_label_column(df)
         
         transaction_ids = df['transaction_id'].tolist() if has_transaction_id else list(range(1, len(df) + 1))
-        actual_fraud = df['is_fraud'].tolist() if has_is_fraud else None
-        amounts = df['amount'].tolist()
+        actual_fraud = df[label_col].to_numpy().astype(int) if label_col else None
+        amounts = df['amount'].to_numpy(dtype=float)
         
         # Подготавливаем признаки для модели
         features_df = df[MODEL_FEATURES].copy()
         
         # Делаем предсказания
-        results = ml_service.score_batch(features_df)
+        # Сгенерированные id не уникальны между загрузками и запросами API, поэтому
+        # отложенные объяснения для них невозможны (такие строки учитываются как пропущенные)
+        results = ml_service.score_batch(
+            features_df,
+            transaction_ids=transaction_ids if has_transaction_id else None
+        )
+        blocked = np.array([res['verdict'] == 'BLOCK' for res in results], dtype=bool)
         
         # Формируем результаты
         predictions = []
-        blocked_count = 0
-        money_saved = 0.0
-        true_positives = 0
-        false_positives = 0
-        true_negatives = 0
-        false_negatives = 0
-        
         for i, res in enumerate(results):
-            tx_id = transaction_ids[i]
-            amount = amounts[i]
-            is_blocked = res['verdict'] == 'BLOCK'
-            
             prediction = {
-                "transaction_id": tx_id,
-                "amount": float(amount),
+                "transaction_id": transaction_ids[i],
+                "amount": float(amounts[i]),
                 "score": res['score'],
                 "verdict": res['verdict'],
-                "explanation": res['explanation']
+                "explanation": res['explanation'],
+                "explanation_status": res.get('explanation_status'),
+                "rule": res.get('rule')
             }
             
             # Если есть реальные метки, добавляем для сравнения
             if actual_fraud is not None:
-                actual = int(actual_fraud[i])
-                prediction["actual_fraud"] = actual
-                prediction["correct"] = (is_blocked and actual == 1) or (not is_blocked and actual == 0)
-                
-                # Считаем метрики
-                if is_blocked and actual == 1:
-                    true_positives += 1
-                elif is_blocked and actual == 0:
-                    false_positives += 1
-                elif not is_blocked and actual == 0:
-                    true_negatives += 1
-                else:  # not blocked and actual == 1
-                    false_negatives += 1
-            
-            if is_blocked:
-                blocked_count += 1
-                money_saved += float(amount)
+                prediction["actual_fraud"] = int(actual_fraud[i])
+                prediction["correct"] = bool(blocked[i] == (actual_fraud[i] == 1))
             
             predictions.append(prediction)
         
         # Формируем статистику
         total = len(predictions)
+        blocked_count = int(blocked.sum())
         stats_response = {
             "total_transactions": total,
             "blocked_count": blocked_count,
             "passed_count": total - blocked_count,
-            "money_saved": money_saved,
+            "money_saved": float(amounts[blocked].sum()),
             "block_rate": round(blocked_count / total * 100, 2) if total > 0 else 0
         }
         
-        # Если есть реальные метки, добавляем метрики качества
+        # Если есть реальные метки, добавляем метрики качества (векторно)
         if actual_fraud is not None:
-            precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
-            recall = true_positives / (true_positives + false_negatives) if (true_positives + false_negatives) > 0 else 0
-            f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-            accuracy = (true_positives + true_negatives) / total if total > 0 else 0
+            cm = confusion_matrix(actual_fraud, blocked)
+            metrics = classification_metrics(cm)
+            # AUC считаются по скорам самой модели (без правил), как в POST /evaluate:
+            # правила BLOCK/PASS выставляют скор 1.0/0.0 и исказили бы ранжирование
+            curves = ThresholdCurves(actual_fraud, ml_service.predict_proba(features_df), amounts)
+            metrics["roc_auc"] = curves.roc_auc()
+            metrics["pr_auc"] = curves.pr_auc()
             
+            # Все доли - в процентах с округлением до 2 знаков
             stats_response["metrics"] = {
-                "accuracy": round(accuracy * 100, 2),
-                "precision": round(precision * 100, 2),
-                "recall": round(recall * 100, 2),
-                "f1_score": round(f1 * 100, 2),
-                "true_positives": true_positives,
-                "false_positives": false_positives,
-                "true_negatives": true_negatives,
-                "false_negatives": false_negatives
+                **{name: round(value * 100, 2) if value is not None else None for name, value in metrics.items()},
+                **cm
             }
         
         # Обновляем глобальную статистику
         stats_service.update_stats_from_batch(predictions)
+        drift_service.update_from_batch(features_df)
         
         return {
             "filename": file.filename,
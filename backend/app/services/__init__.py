@@ -1,2 +1,5 @@
 from .ml_predictor import MLPredictorService
 from .stats_service import StatsService
+from .rule_engine import RuleEngine
+from .explanation_budget import ExplanationBudget
+from .drift_service import DriftService
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Tuple
+
+from core.features import MODEL_FEATURES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Поведенческие признаки, пропуски в которых означают "холодный старт" клиента
+_PATTERN_NUMERIC_COLS = [
+    'monthly_os_changes', 'monthly_phone_model_changes',
+    'logins_last_7_days', 'logins_last_30_days',
+    'login_frequency_7d', 'login_frequency_30d',
+    'freq_change_7d_vs_mean', 'logins_7d_over_30d_ratio',
+    'avg_login_interval_30d', 'std_login_interval_30d',
+    'ewm_login_interval_7d', 'burstiness_login_interval',
+    'zscore_avg_login_interval_7d'
+]
+
+_PHONE_BRANDS = ['iphone', 'samsung', 'xiaomi', 'huawei', 'oppo', 'vivo', 'realme', 'tecno', 'honor']
+
+
+def _read_raw_csv(path: str) -> pd.DataFrame:
+    """Читает выгрузку банка: cp1251, разделитель ';', первая строка - описания колонок."""
+    import pandas as pd
+
+    return pd.read_csv(path, sep=';', encoding='cp1251', header=1)
+
+
+def _clean_datetime(col: pd.Series) -> pd.Series:
+    import pandas as pd
+
+    return pd.to_datetime(col.astype(str).str.strip("'"), errors='coerce')
+
+
+def _extract_brand(model) -> str:
+    model = str(model).lower()
+    for brand in _PHONE_BRANDS:
+        if brand in model:
+            return brand.capitalize()
+    return 'Other'
+
+
+def load_labeled_dataset(data_dir: str, transactions_file: str, patterns_file: str) -> pd.DataFrame:
+    """
+    Собирает размеченный датасет из сырых выгрузок в data/.
+    Повторяет feature engineering из ноутбука обучения (train_model).
+
+    :return: DataFrame, отсортированный по времени, с колонками
+             transaction_id, transdatetime, признаками модели и target.
+    """
+    import numpy as np
+    import pandas as pd
+
+    transactions = _read_raw_csv(os.path.join(data_dir, transactions_file))
+    patterns = _read_raw_csv(os.path.join(data_dir, patterns_file))
+
+    for frame in (transactions, patterns):
+        frame['cst_dim_id'] = pd.to_numeric(frame['cst_dim_id'], errors='coerce')
+        frame['transdate'] = _clean_datetime(frame['transdate']).dt.date
+    transactions['transdatetime'] = _clean_datetime(transactions['transdatetime'])
+
+    df = transactions.merge(patterns, on=['cst_dim_id', 'transdate'], how='left', suffixes=('', '_pattern'))
+
+    # Cold start: клиенты без поведенческой истории
+    df['is_cold_start'] = df['monthly_os_changes'].isna().astype(int)
+    # В выгрузке встречаются значения, испорченные Excel как даты ("01.апр") - считаем их пропусками
+    df[_PATTERN_NUMERIC_COLS] = df[_PATTERN_NUMERIC_COLS].apply(pd.to_numeric, errors='coerce').fillna(-1)
+
+    # Временные признаки
+    dt = df['transdatetime']
+    df['hour_of_day'] = dt.dt.hour
+    df['day_of_week'] = dt.dt.dayofweek
+    day_of_month = dt.dt.day
+    df['is_night'] = (df['hour_of_day'] <= 6).astype(int)
+    df['is_weekend'] = (df['day_of_week'] >= 5).astype(int)
+    df['is_month_end'] = (day_of_month >= 25).astype(int)
+    df['is_month_start'] = (day_of_month <= 5).astype(int)
+    with np.errstate(invalid='ignore'):
+        df['log_amount'] = np.log1p(df['amount'])
+
+    # Категориальные признаки
+    last_os = df['last_os_categorical'].fillna('Unknown').astype(str)
+    df['os_family'] = np.where(
+        last_os.str.contains('iOS', regex=False), 'iOS',
+        np.where(last_os.str.contains('Android', regex=False), 'Android', 'Unknown')
+    )
+    df['phone_brand'] = df['last_phone_model_categorical'].fillna('Unknown').map(_extract_brand)
+    df['direction'] = df['direction'].astype(str)
+
+    df = df.rename(columns={'docno': 'transaction_id'})
+    df = df.sort_values('transdatetime').reset_index(drop=True)
+    return df[['transaction_id', 'transdatetime'] + MODEL_FEATURES + ['target']]
+
+
+def split_train_test(df: pd.DataFrame, train_ratio: float) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Time-series split, как при обучении модели: первые train_ratio строк - обучение."""
+    split_idx = int(len(df) * train_ratio)
+    return df.iloc[:split_idx], df.iloc[split_idx:]
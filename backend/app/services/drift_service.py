@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from core.features import NUMERIC_FEATURES, CATEGORICAL_FEATURES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Пороги PSI: < 0.1 - стабильно, 0.1-0.25 - умеренный сдвиг, >= 0.25 - дрейф
+PSI_MODERATE = 0.10
+PSI_DRIFT = 0.25
+# Высококардинальные категории (больше max_categories значений в baseline) в PSI не входят:
+# по ним отслеживается доля новых значений, алерт - если она выше ожидаемой на этот запас
+NEW_VALUE_SHARE_MARGIN = 0.15
+# Доля начала baseline, относительно которой оценивается доля новых значений в его хвосте
+_NEW_VALUE_HEAD = 0.8
+_PSI_EPS = 1e-4
+_OTHER = "__other__"
+
+
+def _psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population Stability Index между двумя распределениями долей."""
+    expected = np.clip(expected, _PSI_EPS, None)
+    actual = np.clip(actual, _PSI_EPS, None)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def _status(psi: Optional[float], count: int, min_rows: int) -> str:
+    if count == 0:
+        return "no_data"
+    if count < min_rows or psi is None:
+        # Слишком мало наблюдений: PSI/KS на малой выборке дают ложный дрейф
+        return "insufficient_data"
+    if psi >= PSI_DRIFT:
+        return "drift"
+    if psi >= PSI_MODERATE:
+        return "moderate"
+    return "stable"
+
+
+class DriftService:
+    """
+    Мониторинг дрейфа входных признаков.
+    По каждому скоренному пакету обновляет потоковые сводки признаков модели:
+    среднее/дисперсию (Welford, слияние пакетов по Chan), гистограммы с
+    фиксированными бинами (квантили baseline) и частоты категорий.
+    Отчёт сравнивает текущие распределения с baseline из обучающих данных (PSI, KS).
+    """
+
+    def __init__(self, bins: int = 10, max_categories: int = 50, min_rows: int = 300):
+        """
+        :param bins: Число квантильных бинов гистограмм.
+        :param max_categories: Сколько самых частых категорий baseline отслеживать на признак
+                               (остальные и новые значения попадают в "__other__").
+                               Признаки с большим числом значений считаются высококардинальными:
+                               для них вместо PSI считается доля новых значений.
+        :param min_rows: Минимум наблюдений признака, начиная с которого ему присваивается статус
+                         (меньше - "insufficient_data", признак не попадает в алерты).
+        """
+        self.bins = bins
+        self.max_categories = max_categories
+        self.min_rows = min_rows
+        self.numeric_features = list(NUMERIC_FEATURES)
+        self.categorical_features = list(CATEGORICAL_FEATURES)
+        self.baseline: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._reset_internal()
+
+    def _reset_internal(self):
+        """Внутренний метод сброса текущих сводок."""
+        k = len(self.numeric_features)
+        self._count = np.zeros(k)
+        self._mean = np.zeros(k)
+        self._m2 = np.zeros(k)
+        self._hist = [
+            np.zeros(len(edges) + 1, dtype=np.int64) for edges in self.baseline["edges"]
+        ] if self.baseline else []
+        # Для высококардинальных признаков счётчики [известные, новые] значения
+        self._cat_counts = {
+            f: np.zeros(2 if cats["high_cardinality"] else len(cats["values"]) + 1, dtype=np.int64)
+            for f, cats in self.baseline["categories"].items()
+        } if self.baseline else {}
+        self.batches = 0
+        self.batches_skipped = 0
+
+    def load_baseline(self, baseline_df: pd.DataFrame) -> None:
+        """
+        Строит baseline по обучающим данным и сбрасывает текущие сводки.
+
+        :param baseline_df: DataFrame с признаками модели.
+        """
+        import pandas as pd
+
+        X = baseline_df[self.numeric_features].to_numpy(dtype=float)
+        quantiles = np.linspace(0, 1, self.bins + 1)[1:-1]
+
+        edges, hist_props, means, stds = [], [], [], []
+        for i in range(X.shape[1]):
+            col = X[:, i]
+            col = col[~np.isnan(col)]
+            feature_edges = np.unique(np.quantile(col, quantiles))
+            counts = np.bincount(np.searchsorted(feature_edges, col, side='left'),
+                                 minlength=len(feature_edges) + 1)
+            edges.append(feature_edges)
+            hist_props.append(counts / max(counts.sum(), 1))
+            means.append(float(col.mean()))
+            stds.append(float(col.std()))
+
+        # Для категорий: top-N значений baseline, последний элемент долей - "__other__"
+        categories = {}
+        for f in self.categorical_features:
+            values = baseline_df[f].astype(str)
+            freq = values.value_counts(normalize=True)
+            if len(freq) > self.max_categories:
+                # Ожидаемая доля новых значений: хвост baseline (данные упорядочены по времени)
+                # относительно значений, встреченных до него
+                head = int(len(values) * _NEW_VALUE_HEAD)
+                seen = pd.Index(values.iloc[:head].unique())
+                tail_codes = seen.get_indexer(values.iloc[head:].to_numpy())
+                categories[f] = {
+                    "high_cardinality": True,
+                    "values": pd.Index(freq.index),
+                    "new_share": float(np.mean(tail_codes < 0)) if tail_codes.size else 0.0
+                }
+                continue
+            top = freq.iloc[:self.max_categories]
+            categories[f] = {
+                "high_cardinality": False,
+                "values": pd.Index(top.index),
+                "props": np.append(top.to_numpy(dtype=float), max(0.0, 1.0 - top.sum()))
+            }
+
+        with self._lock:
+            self.baseline = {
+                "rows": len(baseline_df),
+                "edges": edges,
+                "hist": hist_props,
+                "mean": means,
+                "std": stds,
+                "categories": categories
+            }
+            self._reset_internal()
+
+    def update_from_batch(self, features_df: pd.DataFrame) -> None:
+        """
+        Обновляет сводки по пакету признаков (векторно, один проход на пакет).
+
+        :param features_df: DataFrame с признаками модели.
+        """
+        baseline = self.baseline
+        if baseline is None or features_df.empty:
+            with self._lock:
+                self.batches_skipped += 1
+            return
+
+        X = features_df[self.numeric_features].to_numpy(dtype=float)
+        valid = ~np.isnan(X)
+        has_missing = not valid.all()
+        batch_count = valid.sum(axis=0)
+        if has_missing:
+            batch_mean = np.where(valid, X, 0.0).sum(axis=0) / np.maximum(batch_count, 1)
+            batch_m2 = (np.where(valid, X - batch_mean, 0.0) ** 2).sum(axis=0)
+        else:
+            batch_mean = X.mean(axis=0)
+            batch_m2 = ((X - batch_mean) ** 2).sum(axis=0)
+
+        batch_hist = []
+        for i, feature_edges in enumerate(baseline["edges"]):
+            col = X[valid[:, i], i] if has_missing else X[:, i]
+            batch_hist.append(np.bincount(np.searchsorted(feature_edges, col, side='left'),
+                                          minlength=len(feature_edges) + 1))
+
+        batch_cats = {}
+        for f, cats in baseline["categories"].items():
+            codes = cats["values"].get_indexer(features_df[f].to_numpy())
+            if cats["high_cardinality"]:
+                new = int(np.count_nonzero(codes < 0))
+                batch_cats[f] = np.array([codes.size - new, new], dtype=np.int64)
+                continue
+            other = len(cats["values"])
+            batch_cats[f] = np.bincount(np.where(codes < 0, other, codes), minlength=other + 1)
+
+        with self._lock:
+            if self.baseline is not baseline:
+                # Baseline перестроен во время обработки пакета - бины несовместимы
+                self.batches_skipped += 1
+                return
+
+            # Слияние среднего и M2 (параллельный вариант алгоритма Welford)
+            total = self._count + batch_count
+            delta = batch_mean - self._mean
+            weight = batch_count / np.maximum(total, 1)
+            self._mean = self._mean + delta * weight
+            self._m2 = self._m2 + batch_m2 + delta ** 2 * self._count * weight
+            self._count = total
+
+            for hist, counts in zip(self._hist, batch_hist):
+                hist += counts
+
+            for f, counts in batch_cats.items():
+                self._cat_counts[f] += counts
+
+            self.batches += 1
+
+    def get_report(self, details: bool = False) -> Dict[str, Any]:
+        """
+        Возвращает отчёт о дрейфе признаков относительно baseline.
+
+        :param details: Включать ли гистограммы и частоты в отчёт.
+        """
+        with self._lock:
+            if self.baseline is None:
+                return {
+                    "baseline_loaded": False,
+                    "batches": self.batches,
+                    "batches_skipped": self.batches_skipped,
+                    "features": []
+                }
+
+            features = [self._numeric_report(i, details) for i in range(len(self.numeric_features))]
+            features += [self._categorical_report(f, details) for f in self.categorical_features]
+
+            return {
+                "baseline_loaded": True,
+                "baseline_rows": self.baseline["rows"],
+                "rows_observed": int(self._count.max()) if len(self._count) else 0,
+                "batches": self.batches,
+                "batches_skipped": self.batches_skipped,
+                "drifted_features": [f["feature"] for f in features if f["status"] == "drift"],
+                "new_value_alerts": [f["feature"] for f in features if f["status"] == "new_values"],
+                "features": features
+            }
+
+    def _numeric_report(self, i: int, details: bool) -> Dict[str, Any]:
+        """Сводка и метрики дрейфа по числовому признаку."""
+        count = int(self._count[i])
+        hist = self._hist[i]
+        expected = self.baseline["hist"][i]
+
+        psi = ks = None
+        if count >= self.min_rows:
+            actual = hist / hist.sum()
+            psi = _psi(expected, actual)
+            # KS по гистограммам: максимум разницы CDF на границах бинов
+            ks = float(np.max(np.abs(np.cumsum(expected) - np.cumsum(actual))))
+
+        report = {
+            "feature": self.numeric_features[i],
+            "type": "numeric",
+            "count": count,
+            "mean": float(self._mean[i]) if count else None,
+            "std": float(np.sqrt(self._m2[i] / count)) if count else None,
+            "baseline_mean": self.baseline["mean"][i],
+            "baseline_std": self.baseline["std"][i],
+            "psi": round(psi, 4) if psi is not None else None,
+            "ks": round(ks, 4) if ks is not None else None,
+            "status": _status(psi, count, self.min_rows)
+        }
+        if details:
+            report["histogram"] = {
+                "edges": self.baseline["edges"][i].tolist(),
+                "baseline": expected.tolist(),
+                "live": hist.tolist()
+            }
+        return report
+
+    def _categorical_report(self, feature: str, details: bool) -> Dict[str, Any]:
+        """Частоты и PSI по категориальному признаку."""
+        cats = self.baseline["categories"][feature]
+        if cats["high_cardinality"]:
+            return self._new_values_report(feature, cats)
+        expected = cats["props"]
+        live = self._cat_counts[feature]
+        count = int(live.sum())
+
+        psi = None
+        actual = np.zeros_like(expected)
+        if count > 0:
+            actual = live / count
+            if count >= self.min_rows:
+                psi = _psi(expected, actual)
+
+        report = {
+            "feature": feature,
+            "type": "categorical",
+            "count": count,
+            # Доля значений вне top-N baseline (редкие и ранее не встречавшиеся)
+            "other_share": round(float(actual[-1]), 4),
+            "baseline_other_share": round(float(expected[-1]), 4),
+            "psi": round(psi, 4) if psi is not None else None,
+            "status": _status(psi, count, self.min_rows)
+        }
+        if details:
+            labels = list(cats["values"]) + [_OTHER]
+            report["frequencies"] = {
+                label: {"baseline": round(float(e), 4), "live": round(float(a), 4)}
+                for label, e, a in zip(labels, expected, actual)
+            }
+        return report
+
+    def _new_values_report(self, feature: str, cats: Dict[str, Any]) -> Dict[str, Any]:
+        """Доля ранее не встречавшихся значений по высококардинальному признаку."""
+        seen, new = (int(c) for c in self._cat_counts[feature])
+        count = seen + new
+        share = new / count if count else None
+
+        if share is None:
+            status = "no_data"
+        elif count < self.min_rows:
+            status = "insufficient_data"
+        elif share > cats["new_share"] + NEW_VALUE_SHARE_MARGIN:
+            status = "new_values"
+        else:
+            status = "stable"
+
+        return {
+            "feature": feature,
+            "type": "categorical",
+            "high_cardinality": True,
+            "count": count,
+            "baseline_categories": len(cats["values"]),
+            "new_value_share": round(share, 4) if share is not None else None,
+            "baseline_new_value_share": round(cats["new_share"], 4),
+            "psi": None,
+            "status": status
+        }
+
+    def reset_stats(self) -> None:
+        """Сбрасывает текущие сводки (baseline сохраняется)."""
+        with self._lock:
+            self._reset_internal()
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, TYPE_CHECKING
+
+import numpy as np
+
+from core.features import MODEL_FEATURES
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .ml_predictor import MLPredictorService
+
+# Колонки с разметкой: is_fraud (загрузка CSV) или target (выгрузки из data/)
+LABEL_COLUMNS = ("is_fraud", "target")
+
+
+def find_label_column(df: pd.DataFrame) -> Optional[str]:
+    """Возвращает имя колонки с разметкой или None."""
+    for col in LABEL_COLUMNS:
+        if col in df.columns:
+            return col
+    return None
+
+
+def confusion_matrix(actual: np.ndarray, blocked: np.ndarray) -> Dict[str, int]:
+    """
+    Матрица ошибок по готовым вердиктам (векторно).
+
+    :param actual: Метки 0/1.
+    :param blocked: Булев массив - транзакция заблокирована.
+    """
+    actual = np.asarray(actual).astype(bool)
+    blocked = np.asarray(blocked).astype(bool)
+    tp = int(np.count_nonzero(blocked & actual))
+    fp = int(np.count_nonzero(blocked & ~actual))
+    fn = int(np.count_nonzero(~blocked & actual))
+    return {
+        "true_positives": tp,
+        "false_positives": fp,
+        "true_negatives": int(actual.size) - tp - fp - fn,
+        "false_negatives": fn
+    }
+
+
+def classification_metrics(cm: Dict[str, int]) -> Dict[str, float]:
+    """Accuracy, precision, recall и F1 (доли 0..1) по матрице ошибок."""
+    tp, fp = cm["true_positives"], cm["false_positives"]
+    tn, fn = cm["true_negatives"], cm["false_negatives"]
+    total = tp + fp + tn + fn
+    precision = tp / (tp + fp) if (tp + fp) > 0 else 0
+    recall = tp / (tp + fn) if (tp + fn) > 0 else 0
+    f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
+    accuracy = (tp + tn) / total if total > 0 else 0
+    return {"accuracy": accuracy, "precision": precision, "recall": recall, "f1_score": f1}
+
+
+class ThresholdCurves:
+    """
+    Метрики для всех порогов сразу, посчитанные за один проход по отсортированным скорам.
+    Транзакция блокируется при score >= threshold, поэтому после сортировки по убыванию
+    блокировка по порогу - это префикс, и все счётчики - кумулятивные суммы.
+    """
+
+    def __init__(self, actual: np.ndarray, scores: np.ndarray, amounts: Optional[np.ndarray] = None):
+        """
+        :param actual: Метки 0/1.
+        :param scores: Вероятности мошенничества.
+        :param amounts: Суммы транзакций (для кривой сэкономленных денег).
+        """
+        scores = np.asarray(scores, dtype=float)
+        actual = np.asarray(actual).astype(bool)
+        amounts = np.zeros(scores.size) if amounts is None else np.asarray(amounts, dtype=float)
+
+        order = np.argsort(-scores, kind="mergesort")
+        self.scores = scores[order]
+        y = actual[order]
+        a = np.nan_to_num(amounts[order])
+
+        self.total = int(scores.size)
+        self.positives = int(np.count_nonzero(y))
+        self.negatives = self.total - self.positives
+
+        # Префиксные суммы с ведущим нулём: индекс k - заблокированы первые k транзакций
+        self._tp = np.concatenate(([0], np.cumsum(y)))
+        self._fp = np.concatenate(([0], np.cumsum(~y)))
+        self._tp_amount = np.concatenate(([0.0], np.cumsum(np.where(y, a, 0.0))))
+        self._fp_amount = np.concatenate(([0.0], np.cumsum(np.where(y, 0.0, a))))
+
+        # Границы групп одинаковых скоров - уникальные пороги (по убыванию)
+        last_of_group = np.r_[np.flatnonzero(np.diff(self.scores)), self.total - 1] if self.total else np.array([], dtype=int)
+        self.thresholds = self.scores[last_of_group]
+        k = last_of_group + 1
+        self.tp = self._tp[k]
+        self.fp = self._fp[k]
+        self.fraud_amount_blocked = self._tp_amount[k]
+        self.legit_amount_blocked = self._fp_amount[k]
+
+    def _blocked_count(self, threshold: float) -> int:
+        """Число транзакций со score >= threshold."""
+        return int(np.searchsorted(-self.scores, -threshold, side="right"))
+
+    def confusion_at(self, threshold: float) -> Dict[str, Any]:
+        """Матрица ошибок и суммы при заданном пороге (O(log n))."""
+        k = self._blocked_count(threshold)
+        tp, fp = int(self._tp[k]), int(self._fp[k])
+        return {
+            "true_positives": tp,
+            "false_positives": fp,
+            "true_negatives": self.negatives - fp,
+            "false_negatives": self.positives - tp,
+            "fraud_amount_blocked": float(self._tp_amount[k]),
+            "legit_amount_blocked": float(self._fp_amount[k])
+        }
+
+    def roc_auc(self) -> Optional[float]:
+        if self.positives == 0 or self.negatives == 0:
+            return None
+        tpr = np.r_[0.0, self.tp / self.positives]
+        fpr = np.r_[0.0, self.fp / self.negatives]
+        return float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+
+    def pr_auc(self) -> Optional[float]:
+        """PR-AUC как average precision (сумма precision по приростам recall)."""
+        if self.positives == 0:
+            return None
+        precision = self.tp / (self.tp + self.fp)
+        recall = np.r_[0.0, self.tp / self.positives]
+        return float(np.sum(np.diff(recall) * precision))
+
+    def f1(self) -> np.ndarray:
+        """F1 для каждого порога."""
+        denominator = 2 * self.tp + self.fp + (self.positives - self.tp)
+        return np.divide(2 * self.tp, denominator, out=np.zeros(self.tp.size), where=denominator > 0)
+
+    def summary(self, threshold: float, max_points: int = 101) -> Dict[str, Any]:
+        """
+        Сводка для API/CLI: AUC, лучший F1, метрики при текущем пороге и
+        прореженные кривые (не более max_points точек).
+        """
+        f1 = self.f1()
+        best = int(np.argmax(f1)) if f1.size else None
+        cm = self.confusion_at(threshold)
+
+        step = max(1, int(np.ceil(self.thresholds.size / max_points)))
+        idx = np.r_[np.arange(0, self.thresholds.size, step), self.thresholds.size - 1] if self.thresholds.size else np.array([], dtype=int)
+        idx = np.unique(idx)
+        tp, fp = self.tp[idx], self.fp[idx]
+
+        def _rate(num, den):
+            return np.round(num / den, 4).tolist() if den else []
+
+        return {
+            "rows": self.total,
+            "positives": self.positives,
+            "roc_auc": _round(self.roc_auc()),
+            "pr_auc": _round(self.pr_auc()),
+            "best_f1": {
+                "threshold": float(self.thresholds[best]),
+                "f1_score": round(float(f1[best]), 4)
+            } if best is not None else None,
+            "at_threshold": {
+                "threshold": threshold,
+                **cm,
+                **{k: round(v, 4) for k, v in classification_metrics(cm).items()}
+            },
+            "curves": {
+                "thresholds": np.round(self.thresholds[idx], 4).tolist(),
+                "tpr": _rate(tp, self.positives),
+                "fpr": _rate(fp, self.negatives),
+                "precision": np.round(tp / np.maximum(tp + fp, 1), 4).tolist(),
+                "f1": np.round(f1[idx], 4).tolist(),
+                "money_saved": np.round(self.fraud_amount_blocked[idx], 2).tolist(),
+                "legit_amount_blocked": np.round(self.legit_amount_blocked[idx], 2).tolist()
+            }
+        }
+
+
+def _round(value: Optional[float], digits: int = 4) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+def evaluate_dataset(ml_service: MLPredictorService, df: pd.DataFrame, chunk_size: int = 50000) -> ThresholdCurves:
+    """
+    Скорит размеченный датасет один раз (по частям) и строит кривые по всем порогам.
+
+    :param df: DataFrame с признаками модели и колонкой is_fraud/target.
+    :param chunk_size: Размер части при скоринге.
+    """
+    label_col = find_label_column(df)
+    if label_col is None:
+        raise ValueError(f"Dataset has no label column, expected one of {LABEL_COLUMNS}")
+
+    missing_cols = [col for col in MODEL_FEATURES if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"Missing required columns: {missing_cols}")
+
+    scores = ml_service.predict_proba(df[MODEL_FEATURES], chunk_size=chunk_size)
+    return ThresholdCurves(df[label_col].to_numpy(), scores, df["amount"].to_numpy())
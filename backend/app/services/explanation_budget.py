@@ -0,0 +1,211 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+OVERFLOW_MODES = ("skip", "defer")
+
+
+class ExplanationBudget:
+    """
+    Политика бюджета SHAP-объяснений.
+    Ограничивает число объяснений на запрос (объясняются самые рискованные строки)
+    и в секунду (token bucket). Кандидаты сверх бюджета пропускаются
+    или откладываются в фоновую очередь (overflow="defer").
+    """
+
+    def __init__(self, max_per_request: Optional[int] = None, rate_per_second: Optional[float] = None,
+                 burst: Optional[int] = None, overflow: str = "skip"):
+        """
+        :param max_per_request: Максимум объяснений на один пакет (None - без ограничения).
+        :param rate_per_second: Скорость пополнения бюджета в секунду (None - без ограничения).
+        :param burst: Ёмкость token bucket (по умолчанию равна rate_per_second).
+        :param overflow: Что делать с кандидатами сверх бюджета: "skip" или "defer".
+        """
+        self._lock = threading.Lock()
+        self.rate_per_second = None
+        self.burst = None
+        self._configure(max_per_request, rate_per_second, burst, overflow)
+        self._reset_counters()
+
+    def _configure(self, max_per_request, rate_per_second, burst, overflow):
+        """Внутренний метод установки параметров политики."""
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"Overflow mode must be one of {OVERFLOW_MODES}")
+        effective_burst = burst if burst is not None else (max(1, int(rate_per_second)) if rate_per_second else None)
+        # Bucket пересоздаётся только при изменении скорости или ёмкости
+        if rate_per_second != self.rate_per_second or effective_burst != self.burst:
+            self._tokens = float(effective_burst) if effective_burst is not None else 0.0
+            self._last_refill = time.monotonic()
+
+        self.max_per_request = max_per_request
+        self.rate_per_second = rate_per_second
+        self._burst_setting = burst  # Значение, заданное явно (None - по умолчанию от rate)
+        self.burst = effective_burst
+        self.overflow = overflow
+
+    def _reset_counters(self):
+        """Внутренний метод сброса счётчиков."""
+        self.counters = {
+            "candidates": 0,
+            "explained": 0,
+            "deferred": 0,
+            "skipped": 0
+        }
+
+    def update(self, **changes: Any) -> Dict[str, Any]:
+        """
+        Частично обновляет параметры политики: меняются только переданные поля,
+        остальные сохраняют текущие значения.
+
+        :param changes: max_per_request, rate_per_second, burst и/или overflow.
+        :return: Текущая конфигурация и счётчики.
+        """
+        with self._lock:
+            settings = {
+                "max_per_request": self.max_per_request,
+                "rate_per_second": self.rate_per_second,
+                "burst": self._burst_setting,
+                "overflow": self.overflow
+            }
+            unknown = set(changes) - set(settings)
+            if unknown:
+                raise ValueError(f"Unknown budget settings: {sorted(unknown)}")
+            settings.update(changes)
+            self._configure(**settings)
+        return self.get_stats()
+
+    def _take_tokens(self, requested: int) -> int:
+        """Забирает до requested токенов из bucket, возвращает выданное количество."""
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._last_refill) * self.rate_per_second)
+        self._last_refill = now
+        granted = min(requested, int(self._tokens))
+        self._tokens -= granted
+        return granted
+
+    def select(self, scores: np.ndarray, candidates: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Делит кандидатов на объяснение на укладывающихся в бюджет и остальных.
+
+        :param scores: Вероятности мошенничества по всему пакету.
+        :param candidates: Индексы строк, для которых требуется объяснение.
+        :return: (индексы для объяснения сейчас, индексы сверх бюджета) - по убыванию риска.
+        """
+        if candidates.size == 0:
+            return candidates, candidates
+
+        # Самые рискованные строки получают объяснение первыми
+        ordered = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        with self._lock:
+            allowed = ordered.size
+            if self.max_per_request is not None:
+                allowed = min(allowed, self.max_per_request)
+            if self.rate_per_second is not None:
+                allowed = self._take_tokens(allowed)
+
+            self.counters["candidates"] += int(ordered.size)
+            self.counters["explained"] += int(allowed)
+
+        return ordered[:allowed], ordered[allowed:]
+
+    def record_overflow(self, deferred: int, skipped: int) -> None:
+        """Учитывает отложенные и пропущенные объяснения."""
+        with self._lock:
+            self.counters["deferred"] += deferred
+            self.counters["skipped"] += skipped
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает конфигурацию политики и счётчики."""
+        with self._lock:
+            return {
+                "max_per_request": self.max_per_request,
+                "rate_per_second": self.rate_per_second,
+                "burst": self.burst,
+                "overflow": self.overflow,
+                **self.counters
+            }
+
+    def reset_stats(self) -> None:
+        """Сбрасывает счётчики."""
+        with self._lock:
+            self._reset_counters()
+
+
+class DeferredExplanations:
+    """
+    Фоновая очередь отложенных SHAP-объяснений.
+    Объяснения считаются отдельным потоком и доступны по transaction_id.
+    """
+
+    def __init__(self, explain_fn: Callable[[Any], list], max_queue: int = 10000, max_results: int = 10000):
+        """
+        :param explain_fn: Функция расчёта объяснения для строки транзакции.
+        :param max_queue: Максимальная длина очереди (при переполнении объяснение пропускается).
+        :param max_results: Сколько последних результатов хранить в памяти.
+        """
+        self._explain_fn = explain_fn
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._max_results = max_results
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def submit(self, transaction_id: Any, transaction_row) -> bool:
+        """
+        Ставит строку в очередь на объяснение.
+
+        :return: False, если очередь переполнена.
+        """
+        key = str(transaction_id)
+        # Статус pending записывается до постановки в очередь,
+        # чтобы не перетереть уже готовый результат воркера
+        self._store(key, {"status": "pending", "explanation": None})
+        try:
+            self._queue.put_nowait((key, transaction_row))
+        except queue.Full:
+            with self._lock:
+                self._results.pop(key, None)
+            return False
+
+        self._ensure_worker()
+        return True
+
+    def get(self, transaction_id: Any) -> Optional[Dict[str, Any]]:
+        """Возвращает статус и объяснение транзакции (None, если её нет)."""
+        with self._lock:
+            result = self._results.get(str(transaction_id))
+            return dict(result) if result is not None else None
+
+    def pending_count(self) -> int:
+        """Количество объяснений в очереди."""
+        return self._queue.qsize()
+
+    def _store(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._results[key] = value
+            self._results.move_to_end(key)
+            while len(self._results) > self._max_results:
+                self._results.popitem(last=False)
+
+    def _ensure_worker(self) -> None:
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="shap-deferred", daemon=True)
+                self._worker.start()
+
+    def _run(self) -> None:
+        """Цикл фонового потока: берёт строки из очереди и считает SHAP."""
+        while True:
+            key, transaction_row = self._queue.get()
+            try:
+                explanation = self._explain_fn(transaction_row)
+                self._store(key, {"status": "ready", "explanation": explanation})
+            except Exception as e:
+                self._store(key, {"status": "error", "explanation": None, "error": str(e)})
+            finally:
+                self._queue.task_done()
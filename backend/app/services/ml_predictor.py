@@ -1,21 +1,36 @@
-import pandas as pd
+from __future__ import annotations
+
 import numpy as np
-import shap
-from catboost import CatBoostClassifier
 import os
+from typing import Optional, TYPE_CHECKING
+
+from .rule_engine import RuleEngine, TERMINAL_ACTIONS
+from .explanation_budget import ExplanationBudget, DeferredExplanations
+
+# pandas, shap и catboost импортируются лениво: их загрузка занимает секунды
+# и не должна задерживать старт API-процесса
+if TYPE_CHECKING:
+    import pandas as pd
 
 class MLPredictorService:
-    def __init__(self, model_path: str, initial_threshold: float = 0.85, shap_threshold: float = 0.5):
+    def __init__(self, model_path: str, initial_threshold: float = 0.85, shap_threshold: float = 0.5,
+                 rule_engine: Optional[RuleEngine] = None,
+                 explanation_budget: Optional[ExplanationBudget] = None):
         """
         Инициализация сервиса предсказаний.
         
         :param model_path: Путь к файлу обученной модели CatBoost.
         :param initial_threshold: Порог вероятности для блокировки транзакции.
         :param shap_threshold: Порог вероятности для расчета SHAP-объяснений (по умолчанию 0.5).
+        :param rule_engine: Движок правил, применяемый до модели (опционально).
+        :param explanation_budget: Политика бюджета SHAP-объяснений (опционально).
         """
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model file not found at: {model_path}")
 
+        import shap
+        from catboost import CatBoostClassifier
+
         self.model = CatBoostClassifier()
         self.model.load_model(model_path)
         
@@ -24,41 +39,127 @@ class MLPredictorService:
         
         self.threshold = initial_threshold
         self.shap_threshold = shap_threshold
+        self.rule_engine = rule_engine
+        self.explanation_budget = explanation_budget
+        self.deferred_explanations = DeferredExplanations(self._calculate_shap)
 
-    def score_batch(self, input_df: pd.DataFrame) -> list:
+    def score_batch(self, input_df: pd.DataFrame, transaction_ids: Optional[list] = None) -> list:
         """
         Основной метод скоринга пакета транзакций.
+        Сначала применяются правила (если подключён RuleEngine): строки с вердиктом
+        правила BLOCK/PASS не передаются в модель и SHAP.
+        Число SHAP-объяснений ограничивается бюджетом (если он задан).
         
         :param input_df: DataFrame с признаками транзакций.
+        :param transaction_ids: Идентификаторы транзакций (нужны для отложенных объяснений).
         :return: Список словарей с результатами скоринга.
         """
         if input_df.empty:
             return []
 
-        # Получение вероятностей (класс 1 - мошенничество)
-        probabilities = self.model.predict_proba(input_df)[:, 1]
+        n = len(input_df)
+        if self.rule_engine is not None:
+            rule_actions, rule_names = self.rule_engine.evaluate(input_df)
+        else:
+            rule_actions = np.full(n, "", dtype=object)
+            rule_names = rule_actions
+
+        # Строки, решённые правилами, получают крайние вероятности
+        terminal_mask = np.isin(rule_actions, TERMINAL_ACTIONS)
+        probabilities = np.where(rule_actions == "BLOCK", 1.0, 0.0)
+
+        # Получение вероятностей (класс 1 - мошенничество) только для оставшихся строк
+        model_idx = np.flatnonzero(~terminal_mask)
+        if model_idx.size:
+            model_df = input_df if model_idx.size == n else input_df.iloc[model_idx]
+            probabilities[model_idx] = self.model.predict_proba(model_df)[:, 1]
+
+        # Кандидаты на SHAP-объяснение и их распределение по бюджету
+        candidates = np.flatnonzero((rule_actions == "") & (probabilities >= self.shap_threshold))
+        explanation_status = np.full(n, "", dtype=object)
+        if self.explanation_budget is not None:
+            explain_idx, overflow_idx = self.explanation_budget.select(probabilities, candidates)
+            self._handle_overflow(input_df, overflow_idx, transaction_ids, explanation_status)
+        else:
+            explain_idx = candidates
+        explanation_status[explain_idx] = "computed"
         
         results = []
         
         # Итерация по транзакциям и вероятностям
         # Используем itertuples для скорости или iloc, но нам нужен доступ к строке как Series для SHAP
         for idx, proba in enumerate(probabilities):
+            action = rule_actions[idx]
+            # Сработавшее правило возвращается отдельным полем, а не элементом SHAP-объяснения
+            rule = {"name": rule_names[idx], "action": action} if action else None
+
+            if action in TERMINAL_ACTIONS:
+                results.append({
+                    "score": float(proba),
+                    "verdict": action,
+                    "explanation": None,
+                    "rule": rule
+                })
+                continue
+
             verdict = "BLOCK" if proba >= self.threshold else "PASS"
             
             explanation = None
-            if proba >= self.shap_threshold:
+            if explanation_status[idx] == "computed":
                 # Получаем строку как Series
                 transaction_row = input_df.iloc[idx]
                 explanation = self._calculate_shap(transaction_row)
             
-            results.append({
+            result = {
                 "score": float(proba),
                 "verdict": verdict,
                 "explanation": explanation
-            })
+            }
+            if rule is not None:
+                result["rule"] = rule
+            if explanation_status[idx] in ("deferred", "skipped"):
+                result["explanation_status"] = explanation_status[idx]
+            results.append(result)
             
         return results
 
+    def predict_proba(self, input_df: pd.DataFrame, chunk_size: int = 50000) -> np.ndarray:
+        """
+        Вероятности мошенничества без правил и SHAP (для офлайн-оценки).
+        Большие датасеты скорятся частями, чтобы ограничить пиковую память.
+
+        :param input_df: DataFrame с признаками транзакций.
+        :param chunk_size: Размер части.
+        :return: Массив вероятностей класса 1.
+        """
+        probabilities = np.empty(len(input_df))
+        for start in range(0, len(input_df), chunk_size):
+            chunk = input_df.iloc[start:start + chunk_size]
+            probabilities[start:start + len(chunk)] = self.model.predict_proba(chunk)[:, 1]
+        return probabilities
+
+    def _handle_overflow(self, input_df: pd.DataFrame, overflow_idx: np.ndarray,
+                         transaction_ids: Optional[list], explanation_status: np.ndarray) -> None:
+        """
+        Откладывает или пропускает объяснения сверх бюджета.
+        Без transaction_ids отложенное объяснение невозможно получить, поэтому оно пропускается.
+        """
+        if overflow_idx.size == 0:
+            return
+
+        deferred = 0
+        if self.explanation_budget.overflow == "defer" and transaction_ids is not None:
+            for idx in overflow_idx:
+                if self.deferred_explanations.submit(transaction_ids[idx], input_df.iloc[idx]):
+                    explanation_status[idx] = "deferred"
+                    deferred += 1
+                else:
+                    explanation_status[idx] = "skipped"
+        else:
+            explanation_status[overflow_idx] = "skipped"
+
+        self.explanation_budget.record_overflow(deferred, int(overflow_idx.size) - deferred)
+
     def _calculate_shap(self, transaction_row: pd.Series) -> list:
         """
         Приватный метод для расчета SHAP-объяснений (XAI).
@@ -66,6 +167,8 @@ class MLPredictorService:
         :param transaction_row: Строка транзакции с признаками.
         :return: Список топ-5 влиятельных признаков.
         """
+        import pandas as pd
+
         # Преобразуем Series в DataFrame (одна строка) для корректной работы SHAP
         # shap_values ожидает 2D массив или DataFrame
         row_df = pd.DataFrame([transaction_row])
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
+
+import numpy as np
+
+from core.features import NUMERIC_FEATURES, CATEGORICAL_FEATURES
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Действия правил:
+# BLOCK / PASS  - окончательный вердикт, транзакция не доходит до CatBoost и SHAP
+# NO_EXPLAIN    - модель скорит транзакцию, но SHAP-объяснение не считается
+RULE_ACTIONS = ("BLOCK", "PASS", "NO_EXPLAIN")
+TERMINAL_ACTIONS = ("BLOCK", "PASS")
+
+_COMPARISONS: Dict[str, Callable[[np.ndarray, Any], np.ndarray]] = {
+    "==": lambda col, v: col == v,
+    "!=": lambda col, v: col != v,
+    ">": lambda col, v: col > v,
+    ">=": lambda col, v: col >= v,
+    "<": lambda col, v: col < v,
+    "<=": lambda col, v: col <= v,
+    "in": lambda col, v: np.isin(col, v),
+    "not_in": lambda col, v: ~np.isin(col, v),
+    "between": lambda col, v: (col >= v[0]) & (col <= v[1]),
+}
+
+# Для категориальных признаков допустимы только сравнения на равенство и вхождение
+_CATEGORICAL_OPS = ("==", "!=", "in", "not_in")
+
+Columns = Dict[str, np.ndarray]
+Mask = Callable[[Columns, int], np.ndarray]
+# Скомпилированные правила и используемые ими признаки (подменяются вместе при перезагрузке)
+RuleSet = Tuple[List[Tuple[str, str, Mask]], List[str]]
+
+
+class RuleEngine:
+    """
+    Декларативный движок правил, работающий до ML-модели.
+    Правила загружаются из JSON-файла и компилируются в векторные маски numpy,
+    которые вычисляются сразу по всему пакету. При изменении файла правила
+    перечитываются автоматически (без перезапуска сервиса).
+    """
+
+    def __init__(self, rules_path: str):
+        """
+        :param rules_path: Путь к JSON-файлу с правилами.
+        """
+        self.rules_path = rules_path
+        self._lock = threading.Lock()
+        self._rules: List[Dict[str, Any]] = []
+        self._ruleset: RuleSet = ([], [])
+        self._mtime: Optional[float] = None
+        self._loaded_at: Optional[str] = None
+        self._last_error: Optional[str] = None
+        self._evaluation_failed = False  # _last_error выставлен при вычислении, а не при загрузке
+        self._hits: Dict[str, int] = {}
+        self.reload(force=True)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Перечитывает файл правил, если он изменился (или force=True).
+        При ошибке разбора остаются действовать предыдущие правила.
+
+        :return: True, если правила были перезагружены.
+        """
+        try:
+            mtime = os.stat(self.rules_path).st_mtime
+        except OSError:
+            mtime = None
+
+        if not force and mtime == self._mtime:
+            return False
+
+        with self._lock:
+            if not force and mtime == self._mtime:
+                return False
+            self._mtime = mtime
+
+            if mtime is None:
+                self._rules, self._ruleset = [], ([], [])
+                self._last_error = f"Rules file not found at: {self.rules_path}"
+                self._evaluation_failed = False
+                return True
+
+            try:
+                with open(self.rules_path, "r", encoding="utf-8") as f:
+                    config = json.load(f)
+                rules = config.get("rules", [])
+                compiled = [self._compile_rule(rule) for rule in rules]
+            except Exception as e:
+                self._last_error = f"Error loading rules: {e}"
+                self._evaluation_failed = False
+                print(self._last_error)
+                return False
+
+            features = sorted({
+                cond["feature"] for rule in rules for cond in rule.get("when", [])
+            })
+            self._rules = rules
+            self._ruleset = (compiled, features)
+            self._hits = {name: self._hits.get(name, 0) for name, _, _ in compiled}
+            self._loaded_at = datetime.now().isoformat()
+            self._last_error = None
+            self._evaluation_failed = False
+            print(f"Loaded {len(compiled)} rules from {self.rules_path}")
+            return True
+
+    def _compile_rule(self, rule: Dict[str, Any]) -> Tuple[str, str, Mask]:
+        """Компилирует правило в функцию (колонки пакета, размер) -> булева маска."""
+        name = rule["name"]
+        action = rule["action"]
+        if action not in RULE_ACTIONS:
+            raise ValueError(f"Rule '{name}': unknown action '{action}'")
+
+        conditions = rule.get("when", [])
+        if not conditions:
+            raise ValueError(f"Rule '{name}': at least one condition is required")
+
+        masks = [self._compile_condition(name, cond) for cond in conditions]
+
+        def mask(columns: Columns, n: int) -> np.ndarray:
+            result = masks[0](columns, n)
+            for m in masks[1:]:
+                result = result & m(columns, n)
+            return result
+
+        return name, action, mask
+
+    @staticmethod
+    def _compile_condition(rule_name: str, condition: Dict[str, Any]) -> Mask:
+        """Компилирует одно условие вида {"feature", "op", "value"}."""
+        feature = condition["feature"]
+        op = condition["op"]
+        value = condition["value"]
+
+        if op not in _COMPARISONS:
+            raise ValueError(f"Rule '{rule_name}': unknown operator '{op}'")
+        RuleEngine._validate_value(rule_name, feature, op, value)
+        if op in ("in", "not_in"):
+            value = np.asarray(value)
+
+        compare = _COMPARISONS[op]
+
+        def mask(columns: Columns, n: int) -> np.ndarray:
+            column = columns.get(feature)
+            if column is None:
+                # Нет признака в пакете - условие не срабатывает
+                return np.zeros(n, dtype=bool)
+            return np.asarray(compare(column, value), dtype=bool)
+
+        return mask
+
+    @staticmethod
+    def _validate_value(rule_name: str, feature: str, op: str, value: Any) -> None:
+        """Проверяет, что оператор и тип значения подходят к типу признака."""
+        if feature in CATEGORICAL_FEATURES:
+            if op not in _CATEGORICAL_OPS:
+                raise ValueError(f"Rule '{rule_name}': operator '{op}' is not supported for categorical '{feature}'")
+            expected, type_name = str, "string"
+        elif feature in NUMERIC_FEATURES:
+            expected, type_name = (int, float), "number"
+        else:
+            raise ValueError(f"Rule '{rule_name}': unknown feature '{feature}'")
+
+        if op in ("in", "not_in"):
+            if not isinstance(value, list):
+                raise ValueError(f"Rule '{rule_name}': '{op}' expects a list")
+            items = value
+        elif op == "between":
+            if not isinstance(value, list) or len(value) != 2:
+                raise ValueError(f"Rule '{rule_name}': 'between' expects [low, high]")
+            items = value
+        else:
+            items = [value]
+
+        for item in items:
+            if isinstance(item, bool) or not isinstance(item, expected):
+                raise ValueError(f"Rule '{rule_name}': '{feature}' expects {type_name} values, got {item!r}")
+
+    def evaluate(self, input_df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Вычисляет правила по всему пакету.
+        Если на строку срабатывает несколько правил, побеждает первое по порядку в файле.
+
+        :param input_df: DataFrame с признаками транзакций.
+        :return: (действия, имена правил) - массивы длины пакета, "" если правило не сработало.
+        """
+        self.reload()
+        # Правила и их признаки читаются одной ссылкой: перезагрузка не смешает наборы
+        compiled, features = self._ruleset
+        n = len(input_df)
+
+        if not compiled or n == 0:
+            empty = np.full(n, "", dtype=object)
+            return empty, empty.copy()
+
+        # Каждая колонка извлекается из DataFrame один раз на пакет
+        columns = {f: input_df[f].to_numpy() for f in features if f in input_df.columns}
+
+        # Индекс первого сработавшего правила для каждой строки (-1 - ни одно)
+        conditions = []
+        error = None
+        for name, _, mask in compiled:
+            try:
+                conditions.append(mask(columns, n))
+            except Exception as e:
+                # Ошибка в правиле не должна ломать скоринг: правило считается несработавшим
+                error = f"Error evaluating rule '{name}': {e}"
+                conditions.append(np.zeros(n, dtype=bool))
+        self._record_evaluation(compiled, error)
+        rule_idx = np.select(conditions, range(len(compiled)), default=-1)
+
+        # Последний элемент ("") соответствует индексу -1
+        actions = np.array([action for _, action, _ in compiled] + [""], dtype=object)[rule_idx]
+        names = np.array([name for name, _, _ in compiled] + [""], dtype=object)[rule_idx]
+
+        counts = np.bincount(rule_idx[rule_idx >= 0], minlength=len(compiled))
+        if counts.any():
+            with self._lock:
+                for (name, _, _), count in zip(compiled, counts):
+                    if count:
+                        self._hits[name] = self._hits.get(name, 0) + int(count)
+
+        return actions, names
+
+    def _record_evaluation(self, compiled: List[Tuple[str, str, Mask]], error: Optional[str]) -> None:
+        """
+        Сохраняет ошибку вычисления правил или сбрасывает прежнюю, если пакет прошёл без ошибок.
+        Ошибки загрузки файла здесь не сбрасываются.
+        """
+        if error is None and not self._evaluation_failed:
+            return
+        with self._lock:
+            if compiled is not self._ruleset[0]:
+                # Правила перезагружены во время пакета - результат относится к старому набору
+                return
+            if error is not None:
+                self._last_error = error
+                self._evaluation_failed = True
+            elif self._evaluation_failed:
+                self._last_error = None
+                self._evaluation_failed = False
+
+    def get_rules(self) -> Dict[str, Any]:
+        """Возвращает загруженные правила и статистику срабатываний."""
+        with self._lock:
+            return {
+                "rules_path": self.rules_path,
+                "loaded_at": self._loaded_at,
+                "last_error": self._last_error,
+                "rules": list(self._rules),
+                "hits": dict(self._hits)
+            }
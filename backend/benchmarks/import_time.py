@@ -0,0 +1,94 @@
+"""
+Отчёт о времени импорта API-процесса на основе `python -X importtime`.
+
+Запуск (из каталога backend):
+    python benchmarks/import_time.py [--top 20] [--module main]
+
+Скрипт импортирует модуль приложения в отдельном интерпретаторе, разбирает
+вывод -X importtime и печатает самые дорогие прямые импорты приложения.
+Если при старте подтягиваются тяжёлые ML-библиотеки, которые должны
+загружаться лениво, скрипт завершается с кодом 1.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# Библиотеки, которые не должны импортироваться при старте API
+HEAVY_MODULES = ("pandas", "shap", "catboost", "numba", "llvmlite", "matplotlib", "sklearn")
+
+
+def run_importtime(module: str) -> Tuple[List[Tuple[str, int, int, int]], float]:
+    """
+    Импортирует модуль с -X importtime.
+
+    :return: (записи (имя, self_us, cumulative_us, уровень вложенности), общее время в секундах).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Import of '{module}' failed:\n{proc.stderr[-2000:]}")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        self_us, cumulative_us, raw_name = int(parts[0]), int(parts[1]), parts[2]
+        # Вложенность кодируется отступом: два пробела на уровень
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        entries.append((raw_name.strip(), self_us, cumulative_us, depth))
+
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return entries, total_us / 1e6
+
+
+def build_report(entries: List[Tuple[str, int, int, int]], total_seconds: float, top: int) -> Dict:
+    """Формирует отчёт: общее время, топ импортов и найденные тяжёлые библиотеки."""
+    # Прямые импорты модуля приложения (уровень вложенности 1)
+    direct = [(name, cumulative) for name, _, cumulative, depth in entries if depth == 1]
+    direct.sort(key=lambda x: x[1], reverse=True)
+
+    imported = {name.split(".")[0] for name, _, _, _ in entries}
+    heavy = sorted(m for m in HEAVY_MODULES if m in imported)
+
+    return {
+        "total_seconds": round(total_seconds, 3),
+        "modules_imported": len(entries),
+        "top_imports": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+            for name, cumulative in direct[:top]
+        ],
+        "heavy_modules_at_startup": heavy
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time report for the API process")
+    parser.add_argument("--module", default="main", help="Module to import (from backend/app)")
+    parser.add_argument("--top", type=int, default=20, help="Number of direct imports to show")
+    args = parser.parse_args()
+
+    entries, total_seconds = run_importtime(args.module)
+    report = build_report(entries, total_seconds, args.top)
+
+    print(f"Import of '{args.module}': {report['total_seconds']}s, {report['modules_imported']} modules")
+    print(f"{'cumulative, ms':>16}  module")
+    for item in report["top_imports"]:
+        print(f"{item['cumulative_ms']:>16}  {item['module']}")
+
+    if report["heavy_modules_at_startup"]:
+        print(f"\nHeavy modules imported at startup: {', '.join(report['heavy_modules_at_startup'])}")
+        sys.exit(1)
+    print("\nNo heavy ML modules imported at startup.")
+
+
+if __name__ == "__main__":
+    main()
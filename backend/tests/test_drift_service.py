@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.features import NUMERIC_FEATURES
+from services.drift_service import DriftService
+
+
+def _frame(rng, rows, directions=None):
+    df = pd.DataFrame(rng.normal(size=(rows, len(NUMERIC_FEATURES))) * 10 + 5, columns=NUMERIC_FEATURES)
+    df["os_family"] = rng.choice(["Android", "iOS"], size=rows)
+    df["phone_brand"] = rng.choice(["Samsung", "Apple", "Xiaomi"], size=rows)
+    df["direction"] = directions if directions is not None else rng.choice(["a", "b", "c"], size=rows)
+    return df
+
+
+def _feature(report, name):
+    return next(f for f in report["features"] if f["feature"] == name)
+
+
+def test_welford_merge_matches_numpy():
+    rng = np.random.default_rng(0)
+    service = DriftService()
+    service.load_baseline(_frame(rng, 500))
+
+    batches = [_frame(rng, n) for n in (1, 7, 250, 64)]
+    batches[2].loc[batches[2].index[:30], "amount"] = np.nan
+    for batch in batches:
+        service.update_from_batch(batch)
+
+    report = service.get_report()
+    data = pd.concat(batches)
+    for name in ("amount", "log_amount", "is_cold_start"):
+        col = data[name].to_numpy()
+        feature = _feature(report, name)
+        assert feature["count"] == np.count_nonzero(~np.isnan(col))
+        assert feature["mean"] == pytest.approx(np.nanmean(col))
+        assert feature["std"] ** 2 == pytest.approx(np.nanvar(col))
+
+
+def test_high_cardinality_categorical_not_in_drifted_features():
+    rng = np.random.default_rng(1)
+    service = DriftService(max_categories=5, min_rows=50)
+    service.load_baseline(_frame(rng, 1000, directions=[f"d{i % 200}" for i in range(1000)]))
+
+    # Все значения новые: алерт по доле новых значений, но не дрейф по PSI
+    service.update_from_batch(_frame(rng, 100, directions=[f"new{i}" for i in range(100)]))
+    report = service.get_report()
+    direction = _feature(report, "direction")
+    assert direction["psi"] is None
+    assert direction["new_value_share"] == 1.0
+    assert report["new_value_alerts"] == ["direction"]
+    assert "direction" not in report["drifted_features"]
+
+
+def test_small_sample_is_insufficient_data():
+    rng = np.random.default_rng(2)
+    baseline = _frame(rng, 1000)
+    service = DriftService(min_rows=300)
+    service.load_baseline(baseline)
+
+    service.update_from_batch(baseline.iloc[100:101])
+    report = service.get_report()
+    assert report["drifted_features"] == []
+    assert report["new_value_alerts"] == []
+    assert {f["status"] for f in report["features"]} == {"insufficient_data"}
+    assert all(f["psi"] is None for f in report["features"])
+
+    service.update_from_batch(baseline.iloc[:400])
+    report = service.get_report()
+    assert report["drifted_features"] == []
+    assert "insufficient_data" not in {f["status"] for f in report["features"]}
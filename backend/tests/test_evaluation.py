@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from services.evaluation import ThresholdCurves
+
+
+def test_known_auc_ap():
+    # Пример из документации scikit-learn: ROC-AUC 0.75, AP 0.8333
+    curves = ThresholdCurves([0, 0, 1, 1], [0.1, 0.4, 0.35, 0.8])
+    assert curves.roc_auc() == pytest.approx(0.75)
+    assert curves.pr_auc() == pytest.approx(0.5 * 1.0 + 0.5 * 2 / 3)
+
+
+def test_ties_form_one_threshold():
+    # Одинаковые скоры - один порог: пара позитив/негатив с равным скором даёт 0.5
+    curves = ThresholdCurves([0, 1, 0, 1], [0.5, 0.5, 0.5, 0.9])
+    assert curves.thresholds.tolist() == [0.9, 0.5]
+    assert curves.roc_auc() == pytest.approx(0.75)
+    assert curves.pr_auc() == pytest.approx(0.75)
+    assert curves.f1() == pytest.approx([2 / 3, 2 / 3])
+
+    cm = curves.confusion_at(0.5)
+    assert (cm["true_positives"], cm["false_positives"], cm["true_negatives"], cm["false_negatives"]) == (2, 2, 0, 0)
+    cm = curves.confusion_at(0.6)
+    assert (cm["true_positives"], cm["false_positives"], cm["true_negatives"], cm["false_negatives"]) == (1, 0, 2, 1)
+
+
+def test_single_class():
+    negatives = ThresholdCurves([0, 0, 0], [0.2, 0.5, 0.9])
+    assert negatives.roc_auc() is None
+    assert negatives.pr_auc() is None
+    assert negatives.f1() == pytest.approx([0, 0, 0])
+
+    positives = ThresholdCurves([1, 1], [0.3, 0.7])
+    assert positives.roc_auc() is None
+    assert positives.pr_auc() == pytest.approx(1.0)
+
+    summary = negatives.summary(0.5)
+    assert summary["roc_auc"] is None and summary["pr_auc"] is None
+    assert summary["curves"]["tpr"] == []
+
+
+def test_money_saved_at_threshold():
+    curves = ThresholdCurves([1, 0, 1, 0], [0.9, 0.8, 0.3, 0.1], amounts=[100.0, 50.0, 20.0, np.nan])
+    cm = curves.confusion_at(0.5)
+    assert cm["fraud_amount_blocked"] == 100.0
+    assert cm["legit_amount_blocked"] == 50.0
@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from services import explanation_budget
+from services.explanation_budget import ExplanationBudget
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время для token bucket."""
+    state = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(explanation_budget, "time", SimpleNamespace(monotonic=lambda: state.now))
+    return state
+
+
+def _granted(budget, n=10):
+    scores = np.linspace(0.1, 0.9, n)
+    explain, overflow = budget.select(scores, np.arange(n))
+    assert explain.size + overflow.size == n
+    return explain.size
+
+
+def test_token_bucket_grants(clock):
+    budget = ExplanationBudget(rate_per_second=2, burst=5)
+    assert _granted(budget) == 5
+    assert _granted(budget) == 0
+    clock.now += 1
+    assert _granted(budget) == 2
+    clock.now += 0.4
+    assert _granted(budget) == 0
+    clock.now += 100
+    assert _granted(budget) == 5
+
+    stats = budget.get_stats()
+    assert (stats["candidates"], stats["explained"]) == (50, 12)
+
+
+def test_max_per_request_picks_riskiest(clock):
+    budget = ExplanationBudget(max_per_request=3)
+    scores = np.array([0.2, 0.9, 0.5, 0.7, 0.1])
+    explain, overflow = budget.select(scores, np.arange(5))
+    assert explain.tolist() == [1, 3, 2]
+    assert overflow.tolist() == [0, 4]
+
+
+def test_partial_update_keeps_bucket(clock):
+    budget = ExplanationBudget(rate_per_second=1, burst=4)
+    assert _granted(budget, 3) == 3
+
+    budget.update(max_per_request=10, overflow="defer")
+    stats = budget.get_stats()
+    assert (stats["rate_per_second"], stats["burst"], stats["overflow"]) == (1, 4, "defer")
+    assert _granted(budget) == 1
+
+    # Изменение скорости пересоздаёт bucket
+    budget.update(rate_per_second=2)
+    assert _granted(budget) == 4
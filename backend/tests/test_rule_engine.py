@@ -0,0 +1,135 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.ml_predictor import MLPredictorService
+from services.rule_engine import RuleEngine
+
+RULES = [
+    {"name": "big_night", "action": "BLOCK",
+     "when": [{"feature": "amount", "op": ">", "value": 1000}, {"feature": "is_night", "op": "==", "value": 1}]},
+    {"name": "big", "action": "PASS", "when": [{"feature": "amount", "op": ">", "value": 500}]},
+    {"name": "tiny", "action": "NO_EXPLAIN", "when": [{"feature": "amount", "op": "<", "value": 10}]},
+]
+
+
+def _write(path, rules, mtime):
+    path.write_text(json.dumps({"rules": rules}), encoding="utf-8")
+    # Явный mtime: перезапись в пределах одной секунды не должна теряться
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def rules_file(tmp_path):
+    path = tmp_path / "rules.json"
+    _write(path, RULES, 1000)
+    return path
+
+
+def _batch(amounts, is_night=None):
+    return pd.DataFrame({
+        "amount": amounts,
+        "is_night": is_night if is_night is not None else [0] * len(amounts),
+        "direction": ["d1"] * len(amounts)
+    })
+
+
+def test_first_matching_rule_wins(rules_file):
+    engine = RuleEngine(str(rules_file))
+    actions, names = engine.evaluate(_batch([2000, 2000, 600, 5, 100], is_night=[1, 0, 1, 0, 0]))
+    assert actions.tolist() == ["BLOCK", "PASS", "PASS", "NO_EXPLAIN", ""]
+    assert names.tolist() == ["big_night", "big", "big", "tiny", ""]
+    assert engine.get_rules()["hits"] == {"big_night": 1, "big": 2, "tiny": 1}
+
+
+@pytest.mark.parametrize("condition", [
+    {"feature": "direction", "op": ">", "value": 5},
+    {"feature": "direction", "op": "==", "value": 5},
+    {"feature": "amount", "op": ">", "value": "100"},
+    {"feature": "amount", "op": "==", "value": True},
+    {"feature": "amount", "op": "in", "value": 100},
+    {"feature": "amount", "op": "between", "value": [1]},
+    {"feature": "amount", "op": "~", "value": 1},
+    {"feature": "unknown_feature", "op": "==", "value": 1},
+])
+def test_invalid_condition_rejected_and_old_rules_kept(rules_file, condition):
+    engine = RuleEngine(str(rules_file))
+    _write(rules_file, [{"name": "bad", "action": "BLOCK", "when": [condition]}], 2000)
+
+    assert engine.reload() is False
+    state = engine.get_rules()
+    assert "bad" in state["last_error"]
+    assert [rule["name"] for rule in state["rules"]] == ["big_night", "big", "tiny"]
+    assert engine.evaluate(_batch([600]))[0].tolist() == ["PASS"]
+
+
+def test_malformed_file_keeps_old_rules(rules_file):
+    engine = RuleEngine(str(rules_file))
+    rules_file.write_text("{not json", encoding="utf-8")
+    os.utime(rules_file, (2000, 2000))
+
+    assert engine.evaluate(_batch([600]))[0].tolist() == ["PASS"]
+    assert engine.get_rules()["last_error"].startswith("Error loading rules")
+
+
+def test_hot_reload_on_mtime_change(rules_file):
+    engine = RuleEngine(str(rules_file))
+    assert engine.evaluate(_batch([600]))[0].tolist() == ["PASS"]
+
+    _write(rules_file, [{"name": "block_all", "action": "BLOCK", "when": [{"feature": "amount", "op": ">=", "value": 0}]}], 2000)
+    actions, names = engine.evaluate(_batch([600]))
+    assert actions.tolist() == ["BLOCK"]
+    assert names.tolist() == ["block_all"]
+    assert engine.get_rules()["last_error"] is None
+
+
+def test_evaluation_error_is_isolated_and_cleared(rules_file):
+    engine = RuleEngine(str(rules_file))
+
+    # Строки вместо чисел: сравнение amount > 1000 падает, правила считаются несработавшими
+    actions, _ = engine.evaluate(_batch(["abc", "def"]))
+    assert actions.tolist() == ["", ""]
+    assert engine.get_rules()["last_error"].startswith("Error evaluating rule")
+
+    engine.evaluate(_batch([600]))
+    assert engine.get_rules()["last_error"] is None
+
+
+class _StubModel:
+    """Модель-заглушка: запоминает строки, переданные в predict_proba."""
+
+    def __init__(self):
+        self.seen = []
+
+    def predict_proba(self, df):
+        self.seen.extend(df["amount"].tolist())
+        return np.column_stack([np.full(len(df), 0.1), np.full(len(df), 0.9)])
+
+
+def test_score_batch_skips_model_and_shap_for_rule_rows(rules_file, monkeypatch):
+    service = MLPredictorService.__new__(MLPredictorService)
+    service.model = _StubModel()
+    service.threshold = 0.6
+    service.shap_threshold = 0.5
+    service.rule_engine = RuleEngine(str(rules_file))
+    service.explanation_budget = None
+    explained = []
+    monkeypatch.setattr(service, "_calculate_shap", lambda row: explained.append(row["amount"]) or [])
+
+    results = service.score_batch(_batch([2000, 600, 5, 100], is_night=[1, 0, 0, 0]))
+
+    # BLOCK/PASS не доходят до модели; NO_EXPLAIN скорится, но без SHAP
+    assert service.model.seen == [5, 100]
+    assert explained == [100]
+    assert [r["verdict"] for r in results] == ["BLOCK", "PASS", "BLOCK", "BLOCK"]
+    assert [r["score"] for r in results] == [1.0, 0.0, 0.9, 0.9]
+    assert [r.get("rule") for r in results] == [
+        {"name": "big_night", "action": "BLOCK"},
+        {"name": "big", "action": "PASS"},
+        {"name": "tiny", "action": "NO_EXPLAIN"},
+        None
+    ]
+    assert [r["explanation"] for r in results] == [None, None, None, []]